@@ -3,162 +3,405 @@ Phone-based Patient Intake Voice AI Agent
 Integrates with Twilio for phone calls
 """
 import asyncio
+import contextlib
+from contextvars import ContextVar
+import functools
+import itertools
 import logging
-from typing import Annotated, Optional
-from datetime import datetime, timedelta
+from typing import Annotated, Awaitable, Callable, Optional
+from datetime import date, timedelta
+from dataclasses import asdict, dataclass, replace
 import random
-import json
 import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import re
+import string
+from urllib.parse import unquote_plus
+from email.header import Header
 from dotenv import load_dotenv
 import aiohttp
-from twilio.rest import Client
+import aiosmtplib
+import orjson
 from twilio.twiml.voice_response import VoiceResponse
 
-# Load environment variables
-load_dotenv()
+# Load environment variables from the .env beside this module rather than searching up the
+# directory tree; anything already exported (by the deployment or a parent process) wins
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
 
-from livekit import rtc
-from livekit.agents import llm
+from livekit import api, rtc
+from livekit.agents import llm, RunContext
 from livekit.agents.voice import AgentSession, Agent
 from livekit.plugins import openai, deepgram, cartesia, silero
 
+# Configured at import so every uvicorn worker process gets a handler; uvicorn only sets up its
+# own loggers, and basicConfig leaves any logging already set up by a host process alone
+logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 logger = logging.getLogger("phone-patient-intake-agent")
 logger.setLevel(logging.INFO)
 
-# Patient data storage (in production, this would be a database)
-patient_info = {
-    "name": None,
-    "date_of_birth": None,
-    "insurance_payer": None,
-    "insurance_id": None,
-    "has_referral": None,
-    "referral_physician": None,
-    "chief_complaint": None,
-    "address": None,
-    "address_valid": False,
-    "phone": None,
-    "email": None,
-    "stage": "greeting"
-}
+
+@dataclass(frozen=True, slots=True)
+class AppointmentSlot:
+    """An appointment slot offered to the patient"""
+    date: str
+    time: str
+    doctor: str
+
+
+@dataclass(slots=True)
+class PatientRecord:
+    """Patient intake data collected during a call"""
+    name: Optional[str] = None
+    date_of_birth: Optional[str] = None
+    insurance_payer: Optional[str] = None
+    insurance_id: Optional[str] = None
+    has_referral: Optional[bool] = None
+    referral_physician: Optional[str] = None
+    chief_complaint: Optional[str] = None
+    address: Optional[str] = None
+    address_valid: bool = False
+    phone: Optional[str] = None
+    email: Optional[str] = None
+    appointment: Optional[AppointmentSlot] = None
+    stage: str = "greeting"
+
+
+# Patient data for Twilio webhook calls, keyed by CallSid (in production, this would be a database).
+# Records are dropped when the call ends; the cap evicts the oldest ones if status callbacks are lost.
+MAX_CALL_RECORDS = 1000
+call_records: dict[str, PatientRecord] = {}
+
+# Record for the LiveKit agent session the current task belongs to
+_current_patient: ContextVar[PatientRecord] = ContextVar("patient")
+
+
+def start_call_record(call_sid: str, record: PatientRecord) -> PatientRecord:
+    """Store a new call's record, evicting the oldest records past MAX_CALL_RECORDS"""
+    # Requests without a CallSid get a throwaway record rather than one shared under a blank key
+    if not call_sid:
+        return record
+    call_records.pop(call_sid, None)
+    call_records[call_sid] = record
+    # Dicts keep insertion order, so the first keys belong to the oldest calls
+    while len(call_records) > MAX_CALL_RECORDS:
+        del call_records[next(iter(call_records))]
+    return record
+
+
+def get_call_record(form_data) -> PatientRecord:
+    """Return the patient record for the Twilio call a webhook request belongs to"""
+    call_sid = form_data.get("CallSid", "")
+    record = call_records.get(call_sid)
+    if record is None:
+        record = start_call_record(call_sid, PatientRecord())
+    return record
+
 
 # Twilio configuration
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_PHONE_NUMBER = "+13505005217"  # Your Twilio number
-twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN) if TWILIO_ACCOUNT_SID else None
 
 
-async def validate_address(address: str) -> dict:
-    """Validate address using external API (mock for now)"""
-    # Mock validation - in production use USPS or Google Maps API
-    required_parts = ["street", "city", "state", "zip"]
-    
+@functools.cache
+def get_twilio_client():
+    """Return the REST client for outbound Twilio calls, created on first use"""
+    if not TWILIO_ACCOUNT_SID:
+        return None
+    # The webhook flow never needs the REST client, so its import is deferred too
+    from twilio.rest import Client
+    return Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+
+
+# LiveKit and AI provider configuration
+LIVEKIT_URL = os.getenv("LIVEKIT_URL")
+LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY")
+LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET")
+DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+CARTESIA_API_KEY = os.getenv("CARTESIA_API_KEY")
+
+# Optional base URL of pre-recorded MP3s for the fixed phone prompts (e.g. a CDN path);
+# when unset, Twilio speaks every prompt with <Say>
+PROMPT_AUDIO_BASE_URL = os.getenv("PROMPT_AUDIO_BASE_URL", "").rstrip("/")
+
+# Longest an agent stays in a room before it hangs up on its own
+MAX_CALL_SECONDS = int(os.getenv("MAX_CALL_SECONDS", "1800"))
+
+# Email configuration (for Gmail, SMTP_PASSWORD is an app password)
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+EMAIL_RECIPIENTS = [addr.strip() for addr in os.getenv("EMAIL_RECIPIENTS", "").split(",") if addr.strip()]
+
+
+# USPS state codes and full names, matched on word boundaries so "al" in "hospital" doesn't count
+STATE_TOKENS = [
+    "al", "ak", "az", "ar", "ca", "co", "ct", "de", "dc", "fl", "ga", "hi", "id", "il", "in",
+    "ia", "ks", "ky", "la", "me", "md", "ma", "mi", "mn", "ms", "mo", "mt", "ne", "nv", "nh",
+    "nj", "nm", "ny", "nc", "nd", "oh", "ok", "or", "pa", "ri", "sc", "sd", "tn", "tx", "ut",
+    "vt", "va", "wa", "wv", "wi", "wy",
+    "alabama", "alaska", "arizona", "arkansas", "california", "colorado", "connecticut",
+    "delaware", "district of columbia", "florida", "georgia", "hawaii", "idaho", "illinois",
+    "indiana", "iowa", "kansas", "kentucky", "louisiana", "maine", "maryland", "massachusetts",
+    "michigan", "minnesota", "mississippi", "missouri", "montana", "nebraska", "nevada",
+    "new hampshire", "new jersey", "new mexico", "new york", "north carolina", "north dakota",
+    "ohio", "oklahoma", "oregon", "pennsylvania", "rhode island", "south carolina",
+    "south dakota", "tennessee", "texas", "utah", "vermont", "virginia", "washington",
+    "west virginia", "wisconsin", "wyoming",
+]
+_STATE_RE = re.compile(r"\b(" + "|".join(STATE_TOKENS) + r")\b", re.IGNORECASE)
+_ZIP_RE = re.compile(r"\b\d{5}(?:-\d{4})?\b")
+_DIGIT_RE = re.compile(r"\d")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _normalize_address(address: str) -> str:
+    """Normalize casing, spacing and trailing punctuation so equivalent addresses share a cache slot"""
+    return _WHITESPACE_RE.sub(" ", address.strip().lower()).rstrip(".,")
+
+
+@functools.lru_cache(maxsize=8192)
+def _validate_address_impl(address: str) -> tuple:
+    """Validate a normalized address, returning (valid, message)"""
+    # Mock validation - in production use USPS or Google Maps API.
+    # Keep the lookup behind this cache so repeated addresses skip the round-trip.
+
     # Simple heuristic validation
-    has_numbers = any(char.isdigit() for char in address)
-    has_comma = "," in address
+    _, comma, after_street = address.partition(",")
+    has_numbers = bool(_DIGIT_RE.search(address))
+    has_comma = bool(comma)
     word_count = len(address.split())
-    
-    if has_numbers and has_comma and word_count >= 4:
-        return {
-            "valid": True,
-            "message": "Address appears valid",
-            "formatted_address": address
-        }
+    # Only look for the state after the street line, where short codes like "in" are unambiguous
+    has_state = _STATE_RE.search(after_street) is not None
+    has_zip = _ZIP_RE.search(address) is not None
+
+    if has_numbers and has_comma and word_count >= 4 and has_state and has_zip:
+        return (True, "Address appears valid")
+
+    missing = []
+    if not has_numbers:
+        missing.append("street number")
+    if word_count < 4:
+        missing.append("complete address (street, city, state, ZIP)")
+    elif not has_comma:
+        # Without a comma there's no city/state part to check yet
+        missing.append("city and state")
     else:
-        missing = []
-        if not has_numbers:
-            missing.append("street number")
-        if word_count < 4:
-            missing.append("complete address (street, city, state, ZIP)")
-        
-        return {
-            "valid": False,
-            "message": f"Address is missing: {', '.join(missing)}",
-            "formatted_address": None
-        }
+        if not has_state:
+            missing.append("state")
+        if not has_zip:
+            missing.append("ZIP code")
+
+    return (False, f"Address is missing: {', '.join(missing)}")
 
 
-async def generate_appointments() -> list:
+async def validate_address(address: str) -> dict:
+    """Validate address using external API (mock for now)"""
+    valid, message = _validate_address_impl(_normalize_address(address))
+    return {
+        "valid": valid,
+        "message": message,
+        "formatted_address": address if valid else None
+    }
+
+
+# Process-wide generator for slot picks and agent identities, seeded once from OS entropy
+_RNG = random.Random()
+
+# Mock scheduling data
+APPOINTMENT_DOCTORS = ("Dr. Smith", "Dr. Johnson", "Dr. Williams")
+APPOINTMENT_TIMES = ("9:00 AM", "10:30 AM", "2:00 PM", "3:30 PM")
+SLOT_POOL_DAYS = 14
+
+# (day offset, time, doctor) combinations for every offerable slot, fixed at import
+_SLOT_TEMPLATE = tuple(itertools.product(range(1, SLOT_POOL_DAYS + 1), APPOINTMENT_TIMES, APPOINTMENT_DOCTORS))
+
+# English day and month names, so slot labels don't depend on the process locale
+_WEEKDAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+_MONTH_NAMES = (
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+)
+
+# Ready-made slots for the next SLOT_POOL_DAYS days, rebuilt when the day rolls over
+_slot_pool = []
+_slot_pool_day = None
+
+
+def _get_slot_pool() -> list[AppointmentSlot]:
+    """Return the slot pool, rebuilding it once its first day is in the past"""
+    global _slot_pool, _slot_pool_day
+    today = date.today()
+    if _slot_pool_day != today:
+        # Label each day once from the name tables, then map the template onto the labels
+        day_labels = []
+        for offset in range(SLOT_POOL_DAYS + 1):
+            day = today + timedelta(days=offset)
+            day_labels.append(f"{_WEEKDAY_NAMES[day.weekday()]}, {_MONTH_NAMES[day.month - 1]} {day.day:02d}")
+        _slot_pool = [AppointmentSlot(day_labels[offset], time, doctor) for offset, time, doctor in _SLOT_TEMPLATE]
+        _slot_pool_day = today
+    return _slot_pool
+
+
+async def generate_appointments() -> list[AppointmentSlot]:
     """Generate fake available appointment slots"""
-    appointments = []
-    base_date = datetime.now() + timedelta(days=1)
-    
-    doctors = ["Dr. Smith", "Dr. Johnson", "Dr. Williams"]
-    times = ["9:00 AM", "10:30 AM", "2:00 PM", "3:30 PM"]
-    
-    for i in range(3):
-        date = base_date + timedelta(days=i)
-        doctor = random.choice(doctors)
-        time = random.choice(times)
-        
-        appointments.append({
-            "date": date.strftime("%A, %B %d"),
-            "time": time,
-            "doctor": doctor
-        })
-    
-    return appointments
+    pool = _get_slot_pool()
+    # Sorted indices keep the offered slots in chronological order, and sampling
+    # without replacement never offers the same slot twice
+    return [pool[i] for i in sorted(_RNG.sample(range(len(pool)), k=3))]
+
+
+# Simple appointment confirmation - ONLY date, time, and doctor
+_EMAIL_TEMPLATE = string.Template("""
+Appointment Confirmation
+
+Appointment Date: $date
+Appointment Time: $time
+Doctor: $doctor
+""")
+_EMAIL_DEFAULTS = {"date": "Not provided", "time": "Not provided", "doctor": "Not provided"}
 
+# Plain-text message headers that don't change between sends, encoded once
+_EMAIL_HEADERS = (
+    f"From: {SMTP_USER}\r\n"
+    f"To: {', '.join(EMAIL_RECIPIENTS)}\r\n"
+    "MIME-Version: 1.0\r\n"
+    "Content-Type: text/plain; charset=\"utf-8\"\r\n"
+    "Content-Transfer-Encoding: 8bit\r\n"
+).encode()
 
-async def send_patient_info_email(patient_data: dict):
+# Number of authenticated SMTP connections kept open for confirmation emails
+SMTP_POOL_SIZE = 4
+SMTP_SEND_TIMEOUT = 10  # seconds, for connecting and logging in, and again for each send
+
+
+async def _with_send_timeout(aw):
+    """Await one SMTP step, reporting a stall past SMTP_SEND_TIMEOUT as SMTPTimeoutError"""
+    try:
+        return await asyncio.wait_for(aw, timeout=SMTP_SEND_TIMEOUT)
+    except aiosmtplib.SMTPException:
+        # aiosmtplib's own timeouts subclass TimeoutError; keep their messages
+        raise
+    except asyncio.TimeoutError:
+        raise aiosmtplib.SMTPTimeoutError(f"SMTP server stalled for more than {SMTP_SEND_TIMEOUT}s") from None
+
+
+class SMTPPool:
+    """Fixed-size pool of authenticated SMTP connections reused across sends"""
+
+    def __init__(self, size: int):
+        # Slots start empty (None) and connect on first use, since there's no event loop at import
+        self._idle: asyncio.Queue = asyncio.Queue()
+        for _ in range(size):
+            self._idle.put_nowait(None)
+
+    @staticmethod
+    async def _connect() -> aiosmtplib.SMTP:
+        """Open and log in a new connection"""
+        client = aiosmtplib.SMTP(hostname=SMTP_HOST, port=SMTP_PORT, start_tls=True)
+        try:
+            await client.connect()
+            await client.login(SMTP_USER, SMTP_PASSWORD)
+        except BaseException:
+            if client.is_connected:
+                client.close()
+            raise
+        return client
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        """Check out a logged-in connection, reconnecting the slot if it was dropped"""
+        # Waiting for a free slot isn't timed; only the work on the server is
+        client = await self._idle.get()
+        try:
+            if client is None or not client.is_connected:
+                client = None
+                client = await _with_send_timeout(self._connect())
+            yield client
+        except BaseException:
+            # The connection state is unknown after a failure; reopen it on next use
+            if client is not None and client.is_connected:
+                client.close()
+            client = None
+            raise
+        finally:
+            self._idle.put_nowait(client)
+
+
+_smtp_pool = SMTPPool(SMTP_POOL_SIZE)
+
+
+async def _send_smtp_message(message: bytes):
+    """Send a raw message over a pooled SMTP connection"""
+    # Retry once if the server dropped the idle connection since its last send
+    for attempt in range(2):
+        try:
+            async with _smtp_pool.acquire() as client:
+                # A stalled server would otherwise hold the slot indefinitely; the
+                # timeout closes the connection so the slot reconnects next time
+                await _with_send_timeout(client.sendmail(SMTP_USER, EMAIL_RECIPIENTS, message))
+            return
+        except aiosmtplib.SMTPServerDisconnected:
+            if attempt:
+                raise
+
+
+async def send_patient_info_email(patient_data: PatientRecord):
     """Send appointment confirmation email to all specified recipients"""
     try:
-        # Email configuration
-        sender_email = ""
-        sender_password = ""  # App password
-        
-        # add recipients emails
-        recipients = []
-        
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = ", ".join(recipients)
-        msg['Subject'] = f"Appointment Confirmation - {patient_data.get('name', 'Unknown')}"
+        # Only the subject and body vary; collapse whitespace so a name can't inject headers
+        name = " ".join((patient_data.name or "Unknown").split())
+        subject = Header(f"Appointment Confirmation - {name}", "utf-8").encode()
         
         # Get appointment info
-        appointment = patient_data.get('appointment', {})
+        appointment = asdict(patient_data.appointment) if patient_data.appointment else {}
+        body = _EMAIL_TEMPLATE.substitute({**_EMAIL_DEFAULTS, **appointment})
         
-        # Simple appointment confirmation - ONLY date, time, and doctor
-        body = f"""
-Appointment Confirmation
-
-Appointment Date: {appointment.get('date', 'Not provided')}
-Appointment Time: {appointment.get('time', 'Not provided')}
-Doctor: {appointment.get('doctor', 'Not provided')}
-        """
-        
-        msg.attach(MIMEText(body, 'plain'))
+        message = _EMAIL_HEADERS + f"Subject: {subject}\r\n\r\n{body}".encode()
         
-        # Send email to all recipients
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        text = msg.as_string()
-        server.sendmail(sender_email, recipients, text)
-        server.quit()
+        # Send email to all recipients without blocking the event loop
+        await _send_smtp_message(message)
         
-        logger.info(f"Appointment confirmation sent to {len(recipients)} recipients")
+        logger.info("Appointment confirmation sent to %s recipients", len(EMAIL_RECIPIENTS))
         return True
         
     except Exception as e:
-        logger.error(f"Failed to send appointment confirmation email: {e}")
+        logger.error("Failed to send appointment confirmation email: %s", e)
         return False
 
 
 
-# Define AI-callable tools using function decorators
+# Background sends stay referenced until they finish so they aren't garbage-collected mid-flight
+_email_tasks = set()
+
+
+def _on_email_task_done(task: asyncio.Task):
+    """Release a finished email task and log anything it raised"""
+    _email_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background confirmation email failed: %s", task.exception())
+
+
+def schedule_patient_info_email(patient: PatientRecord):
+    """Send the confirmation email in the background from a snapshot of the record"""
+    # Snapshot the record so later edits don't race with the send
+    task = asyncio.create_task(send_patient_info_email(replace(patient)))
+    _email_tasks.add(task)
+    task.add_done_callback(_on_email_task_done)
+    return task
+
+
+# Define AI-callable tools using function decorators.
+# Each tool reads the calling session's record from _current_patient.
 
 @llm.function_tool(description="Store the patient's full name")
 async def store_patient_name(
     name: Annotated[str, "The patient's full name"]
 ):
     """Store patient's name"""
-    patient_info["name"] = name
-    patient_info["stage"] = "dob"
+    patient = _current_patient.get()
+    patient.name = name
+    patient.stage = "dob"
     return f"Stored name: {name}"
 
 
@@ -167,8 +410,9 @@ async def store_date_of_birth(
     date_of_birth: Annotated[str, "Patient's date of birth in MM/DD/YYYY format"]
 ):
     """Store patient's date of birth"""
-    patient_info["date_of_birth"] = date_of_birth
-    patient_info["stage"] = "insurance"
+    patient = _current_patient.get()
+    patient.date_of_birth = date_of_birth
+    patient.stage = "insurance"
     return f"Stored date of birth: {date_of_birth}"
 
 
@@ -178,9 +422,10 @@ async def store_insurance(
     insurance_id: Annotated[str, "Insurance ID number"]
 ):
     """Store insurance information"""
-    patient_info["insurance_payer"] = payer_name
-    patient_info["insurance_id"] = insurance_id
-    patient_info["stage"] = "referral"
+    patient = _current_patient.get()
+    patient.insurance_payer = payer_name
+    patient.insurance_id = insurance_id
+    patient.stage = "referral"
     return f"Stored insurance: {payer_name}, ID: {insurance_id}"
 
 
@@ -190,9 +435,10 @@ async def store_referral_info(
     physician_name: Annotated[Optional[str], "Referring physician name, if applicable (optional)"] = None
 ):
     """Store referral information"""
-    patient_info["has_referral"] = has_referral
-    patient_info["referral_physician"] = physician_name or ""
-    patient_info["stage"] = "complaint"
+    patient = _current_patient.get()
+    patient.has_referral = has_referral
+    patient.referral_physician = physician_name or ""
+    patient.stage = "complaint"
     
     if has_referral and physician_name:
         return f"Stored referral from Dr. {physician_name}"
@@ -205,8 +451,9 @@ async def store_chief_complaint(
     complaint: Annotated[str, "The patient's chief medical complaint or reason for visit"]
 ):
     """Store chief complaint"""
-    patient_info["chief_complaint"] = complaint
-    patient_info["stage"] = "address"
+    patient = _current_patient.get()
+    patient.chief_complaint = complaint
+    patient.stage = "address"
     return f"Stored chief complaint: {complaint}"
 
 
@@ -215,13 +462,14 @@ async def store_and_validate_address(
     address: Annotated[str, "Complete mailing address including street, city, state, and ZIP code"]
 ):
     """Store and validate address"""
+    patient = _current_patient.get()
     validation_result = await validate_address(address)
     
-    patient_info["address"] = address
-    patient_info["address_valid"] = validation_result["valid"]
+    patient.address = address
+    patient.address_valid = validation_result["valid"]
     
     if validation_result["valid"]:
-        patient_info["stage"] = "contact"
+        patient.stage = "contact"
         return f"Address validated: {validation_result['formatted_address']}"
     else:
         return f"Address validation failed: {validation_result['message']}. Please provide the complete address."
@@ -233,9 +481,10 @@ async def store_contact_info(
     email: Annotated[Optional[str], "Patient's email address (optional)"] = None
 ):
     """Store contact information"""
-    patient_info["phone"] = phone
-    patient_info["email"] = email or ""
-    patient_info["stage"] = "appointments"
+    patient = _current_patient.get()
+    patient.phone = phone
+    patient.email = email or ""
+    patient.stage = "appointments"
     
     if email:
         return f"Stored contact info - Phone: {phone}, Email: {email}"
@@ -243,52 +492,158 @@ async def store_contact_info(
         return f"Stored phone number: {phone}"
 
 
-@llm.function_tool(description="Get available appointment times")
-async def get_available_appointments():
-    """Get available appointment slots and send patient info via email"""
+@llm.function_tool(description="Get available appointment times and read them to the patient")
+async def get_available_appointments(context: RunContext):
+    """Read available appointment slots to the patient and send patient info via email"""
+    patient = _current_patient.get()
     appointments = await generate_appointments()
-    patient_info["stage"] = "complete"
+    patient.stage = "complete"
     
-    appointment_text = "Here are the available appointments:\n"
+    # Speak each option as soon as it's formatted instead of waiting for the LLM to read
+    # the whole list back; say() queues the lines so they play in order.
+    say = context.session.say
+    say("Here are the available appointments.")
     for i, apt in enumerate(appointments, 1):
-        appointment_text += f"{i}. {apt['date']} at {apt['time']} with {apt['doctor']}\n"
+        say(f"Option {i}: {apt.date} at {apt.time} with {apt.doctor}.")
     
-    # Send patient information via email
-    email_sent = await send_patient_info_email(patient_info)
-    if email_sent:
-        appointment_text += "\n\n Your information has been sent to our scheduling team. They will contact you shortly to confirm your appointment."
-    else:
-        appointment_text += "\n\n There was an issue sending your information. Please call our office directly to complete your appointment booking."
+    # Send patient information via email in the background so the slots are spoken right away
+    schedule_patient_info_email(patient)
     
-    return appointment_text
+    return (
+        f"Read {len(appointments)} appointment options to the patient. "
+        "Their information is being sent to our scheduling team, who will contact them shortly to confirm the appointment."
+    )
 
 
 @llm.function_tool(description="Get a summary of all collected patient information")
 async def get_patient_summary():
     """Get summary of collected information"""
-    return json.dumps(patient_info, indent=2)
+    patient = _current_patient.get()
+    # orjson serializes the dataclass natively; compact output because the LLM reads
+    # raw tokens, so indentation only adds latency
+    return orjson.dumps(patient).decode()
+
+
+# Agent instructions, shared by every session
+_AGENT_INSTRUCTIONS = """You are a friendly and professional medical receptionist conducting patient intake over the phone.
+
+Your job is to collect the following information IN ORDER:
+1. Patient's full name
+2. Date of birth (MM/DD/YYYY format)
+3. Insurance information - ask for the insurance company and ID number in one question
+4. Whether they have a referral, and if so, to which physician
+5. Chief medical complaint or reason for their visit
+6. Complete mailing address (street, city, state, ZIP code)
+   - If the address validation fails, ask them to provide the missing information
+7. Contact information - ask for their phone number and, optionally, email in one question
+8. After all information is collected, offer available appointment times
+
+Guidelines:
+- Be warm, empathetic, and professional
+- Speak naturally and conversationally
+- Ask one question at a time; the insurance and contact questions each cover both fields, so store them with a single tool call
+- Confirm information when needed
+- Use the provided tools to store and validate information
+- When validating the address, if it's invalid, clearly explain what's missing
+- After collecting all information, use the get_available_appointments tool; it reads the options aloud, so don't repeat them
+- Keep responses concise and clear
+- Remember this is a phone call, so speak clearly and wait for responses
+
+Start by greeting the patient and asking for their full name."""
+
+
+# Per-process resources shared by every call, like LiveKit's JobProcess.userdata
+_proc_userdata = {}
+
+
+def prewarm():
+    """Load the Silero VAD model once per process"""
+    _proc_userdata["vad"] = silero.VAD.load(min_silence_duration=0.5, activation_threshold=0.4)
+
+
+# HTTP session shared by the STT/TTS plugins across calls so connections stay warm
+_http_session: Optional[aiohttp.ClientSession] = None
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """Return the process-wide HTTP session, creating it on first use"""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=200,
+                limit_per_host=50,
+                ttl_dns_cache=300,
+                keepalive_timeout=300,
+                enable_cleanup_closed=True
+            )
+        )
+    return _http_session
+
+
+# Plugin API hosts whose TLS connections are opened before the first call needs them
+_WARM_HOSTS = (
+    ("https://api.deepgram.com", DEEPGRAM_API_KEY),
+    ("https://api.cartesia.ai", CARTESIA_API_KEY),
+)
+
+
+async def warm_vad():
+    """Load the VAD off-loop, leaving it to load on first use if that fails"""
+    # The webhook flow never uses the VAD, so a missing model mustn't stop the server starting
+    try:
+        await asyncio.to_thread(prewarm)
+    except Exception as e:
+        logger.warning("VAD warm-up failed: %s", e)
+
+
+async def warm_http_connections():
+    """Open pooled connections to the configured STT/TTS hosts"""
+    session = await get_http_session()
+    timeout = aiohttp.ClientTimeout(total=5)
+    
+    async def head(url):
+        async with session.head(url, timeout=timeout):
+            pass
+    
+    results = await asyncio.gather(
+        *(head(url) for url, api_key in _WARM_HOSTS if api_key),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning("HTTP connection warm-up failed: %s", result)
+
+
+async def _warmup(component):
+    """Open a pipeline component's connections ahead of the first turn, if it supports it"""
+    if hasattr(component, "aconnect"):
+        await component.aconnect()
+    elif hasattr(component, "prewarm"):
+        component.prewarm()
+    return component
 
 
 async def run_agent_in_room(room_name: str, caller_phone: str = None):
     """Directly connect agent to a specific room"""
-    logger.info(f" Agent directly connecting to room: {room_name}")
+    logger.info(" Agent directly connecting to room: %s", room_name)
+    
+    # Give this session its own patient record; tools resolve it through the context
+    patient = PatientRecord()
+    _current_patient.set(patient)
     
     # Store caller phone if provided
     if caller_phone:
-        patient_info["phone"] = caller_phone
+        patient.phone = caller_phone
     
     # Create a room connection
     room = rtc.Room()
-    
-    # Connect to the room
-    livekit_url = os.getenv("LIVEKIT_URL")
-    api_key = os.getenv("LIVEKIT_API_KEY")
-    api_secret = os.getenv("LIVEKIT_API_SECRET")
+    disconnected = asyncio.Event()
+    room.on("disconnected", lambda *_: disconnected.set())
     
     # Generate agent token
-    from livekit import api
-    token = api.AccessToken(api_key, api_secret)
-    token.with_identity(f"agent-{random.randint(1000, 9999)}")
+    token = api.AccessToken(LIVEKIT_API_KEY, LIVEKIT_API_SECRET)
+    token.with_identity(f"agent-{_RNG.randint(1000, 9999)}")
     token.with_name("Patient Intake Agent")
     token.with_grants(api.VideoGrants(
         room_join=True,
@@ -298,9 +653,6 @@ async def run_agent_in_room(room_name: str, caller_phone: str = None):
         can_publish_data=True,
     ))
     
-    await room.connect(livekit_url, token.to_jwt())
-    logger.info(f" Agent connected to room: {room_name}")
-    
     # Collect all tools
     tools = [
         store_patient_name,
@@ -315,45 +667,41 @@ async def run_agent_in_room(room_name: str, caller_phone: str = None):
     ]
     
     # Define the agent with instructions
-    from livekit.agents.voice import Agent
     agent = Agent(
-        instructions="""You are a friendly and professional medical receptionist conducting patient intake over the phone.
-
-Your job is to collect the following information IN ORDER:
-1. Patient's full name
-2. Date of birth (MM/DD/YYYY format)
-3. Insurance information (payer name and ID number)
-4. Whether they have a referral, and if so, to which physician
-5. Chief medical complaint or reason for their visit
-6. Complete mailing address (street, city, state, ZIP code)
-   - If the address validation fails, ask them to provide the missing information
-7. Contact information (phone number and optionally email)
-8. After all information is collected, offer available appointment times
-
-Guidelines:
-- Be warm, empathetic, and professional
-- Speak naturally and conversationally
-- Ask one question at a time
-- Confirm information when needed
-- Use the provided tools to store and validate information
-- When validating the address, if it's invalid, clearly explain what's missing
-- After collecting all information, use the get_available_appointments tool to show options
-- Keep responses concise and clear
-- Remember this is a phone call, so speak clearly and wait for responses
-
-Start by greeting the patient and asking for their full name.""",
+        instructions=_AGENT_INSTRUCTIONS,
         tools=tools,
     )
     
-    # Create a dedicated HTTP session for plugins (since we're not in worker job context)
-    http_session = aiohttp.ClientSession()
+    # Reuse the shared HTTP session for plugins (since we're not in worker job context)
+    http_session = await get_http_session()
+    
+    stt = deepgram.STT(api_key=DEEPGRAM_API_KEY, http_session=http_session)
+    agent_llm = openai.LLM(model="gpt-4o-mini")
+    tts = cartesia.TTS(api_key=CARTESIA_API_KEY, http_session=http_session)
+    
+    # Connect to the room while the pipeline warms up, so startup costs the slowest
+    # step rather than the sum of them. The VAD loads off-loop if the process wasn't prewarmed.
+    startup = [
+        room.connect(LIVEKIT_URL, token.to_jwt()),
+        _warmup(stt),
+        _warmup(agent_llm),
+        _warmup(tts),
+    ]
+    if "vad" not in _proc_userdata:
+        startup.append(asyncio.to_thread(prewarm))
+    await asyncio.gather(*startup)
+    logger.info(" Agent connected to room: %s", room_name)
 
     # Initialize the agent session with voice pipeline
+    # Preemptive generation starts the LLM on the interim transcript, and the short
+    # endpointing delay lets the reply begin as soon as VAD sees the caller stop.
     session = AgentSession(
-        vad=silero.VAD.load(),
-        stt=deepgram.STT(api_key=os.getenv("DEEPGRAM_API_KEY"), http_session=http_session),
-        llm=openai.LLM(model="gpt-4o-mini"),
-        tts=cartesia.TTS(api_key=os.getenv("CARTESIA_API_KEY"), http_session=http_session),
+        vad=_proc_userdata["vad"],
+        stt=stt,
+        llm=agent_llm,
+        tts=tts,
+        min_endpointing_delay=0.05,
+        preemptive_generation=True,
     )
     
     # Start the session
@@ -367,13 +715,14 @@ Start by greeting the patient and asking for their full name.""",
     
     # Keep the agent running (no wait_for_completion in this API)
     try:
-        # Wait for room to disconnect or session to close
-        # Use room state monitoring instead of wait_for_disconnect
-        while room.state != rtc.RoomState.DISCONNECTED:
-            await asyncio.sleep(1)
+        # Wait for the room's disconnected event rather than polling its state,
+        # capped so a room that never reports disconnecting can't hold the agent forever
+        await asyncio.wait_for(disconnected.wait(), timeout=MAX_CALL_SECONDS)
         logger.info("Room disconnected")
+    except asyncio.TimeoutError:
+        logger.warning("Call in room %s exceeded %s seconds, ending session", room_name, MAX_CALL_SECONDS)
     except Exception as e:
-        logger.error(f"Session error: {e}")
+        logger.error("Session error: %s", e)
     finally:
         # Clean up
         try:
@@ -384,725 +733,399 @@ Start by greeting the patient and asking for their full name.""",
             await room.disconnect()
         except:
             pass
-        try:
-            await http_session.close()
-        except:
-            pass
         logger.info("Cleanup completed")
         logger.info("Patient intake session completed")
-        logger.info(f"Final patient data: {patient_info}")
+        logger.info("Final patient data: %s", patient)
 
 
 # FastAPI server for Twilio webhooks
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import PlainTextResponse
+from fastapi import FastAPI, HTTPException, Request, Form
+from fastapi.responses import JSONResponse, Response
 import uvicorn
 
-app = FastAPI()
-
-@app.post("/voice/incoming")
-async def handle_voice_webhook(request: Request):
-    """Handle incoming Twilio voice calls"""
-    try:
-        form_data = await request.form()
-        caller_phone = form_data.get("From")
-        call_sid = form_data.get("CallSid")
-        
-        logger.info(f" Incoming call from {caller_phone}, Call SID: {call_sid}")
-        
-        # Return TwiML response to start patient intake
-        response = VoiceResponse()
-        response.say("Hello! Thank you for calling our patient intake system.")
-        
-        # Use gather to collect voice input for name
-        gather = response.gather(
-            input="speech",
-            action="/voice/collect-name",
-            method="POST",
-            speech_timeout="auto",
-            timeout=10
-        )
-        gather.say("May I have your full name, please?")
-        
-        # Fallback if no input - redirect to retry
-        response.redirect("/voice/retry-name", method="POST")
-        
-        return PlainTextResponse(str(response), media_type="application/xml")
-        
-    except Exception as e:
-        logger.error(f"Error handling voice webhook: {e}")
-        response = VoiceResponse()
-        response.say("I'm sorry, there was an error. Please try again later.")
-        return PlainTextResponse(str(response), media_type="application/xml")
-
-
-@app.post("/voice/collect-name")
-async def collect_name(request: Request):
-    """Collect patient name and continue intake process"""
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm shared resources before the first call and release them on shutdown"""
     try:
-        form_data = await request.form()
-        name = form_data.get("SpeechResult", "").strip()
-        caller_phone = form_data.get("From")
-        
-        logger.info(f"Patient {caller_phone} provided name: {name}")
-        
-        # Store the name
-        patient_info["name"] = name
-        patient_info["phone"] = caller_phone
-        
-        response = VoiceResponse()
-        
-        if name:
-            response.say(f"Thank you, {name}.")
-            
-            # Collect date of birth
-            gather = response.gather(
-                input="speech",
-                action="/voice/collect-dob",
-                method="POST",
-                speech_timeout="auto",
-                timeout=10
-            )
-            gather.say("What is your date of birth? Please say the month, day, and year.")
-            
-            # Fallback - redirect to retry
-            response.redirect("/voice/retry-dob", method="POST")
-        else:
-            # Redirect to retry
-            response.redirect("/voice/retry-name", method="POST")
-        
-        return PlainTextResponse(str(response), media_type="application/xml")
-        
-    except Exception as e:
-        logger.error(f"Error collecting name: {e}")
-        response = VoiceResponse()
-        response.say("I'm sorry, there was an error. Please try again later.")
-        return PlainTextResponse(str(response), media_type="application/xml")
+        # The VAD model load is blocking, so it runs off-loop alongside the network warm-up
+        await asyncio.gather(warm_http_connections(), warm_vad())
+        yield
+    finally:
+        # Close the shared plugin HTTP session
+        if _http_session is not None and not _http_session.closed:
+            await _http_session.close()
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response serialized with orjson"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+
+def twiml(content) -> Response:
+    """Return a VoiceResponse, or TwiML already serialized to bytes, as an XML response"""
+    if isinstance(content, VoiceResponse):
+        content = str(content).encode()
+    return Response(content=content, media_type="application/xml")
+
+
+@app.exception_handler(Exception)
+async def handle_unexpected_error(request: Request, exc: Exception):
+    """Answer a webhook that failed with the shared error TwiML"""
+    logger.error("Error handling %s: %s", request.url.path, exc)
+    # Twilio speaks whatever a voice webhook returns; everything else gets a plain 500
+    if request.url.path.startswith(("/voice", "/webhook/voice")):
+        return twiml(_ERROR_TWIML)
+    return ORJSONResponse({"status": "error"}, status_code=500)
+
+
+async def read_form_fields(request: Request, *keys: str) -> dict[str, str]:
+    """Parse only the given fields from a Twilio webhook's form-encoded body"""
+    # Twilio posts urlencoded bodies, so skip Starlette's general form parser. Its parameter
+    # names are plain ASCII, so only the values we keep need unquoting.
+    fields = {}
+    for pair in (await request.body()).decode().split("&"):
+        key, _, value = pair.partition("=")
+        if key in keys:
+            fields[key] = unquote_plus(value)
+    return fields
+
+
+# Each intake question is one step; answers are posted to /voice/collect/{step_id}
+# and unanswered gathers fall through to /voice/retry/{step_id}
+_GOODBYE_FALLBACK = "I'm having trouble hearing you. Please try calling back when you have a better connection. Goodbye."
+
+
+@dataclass(frozen=True, slots=True)
+class IntakeStep:
+    field: str
+    prompt: str
+    retry_notice: str
+    retry_prompt: str
+    confirmation: str = "Thank you."
+    next_step: Optional[str] = None
+    input: str = "speech"
+    # Seconds to wait for the caller to start answering
+    timeout: int = 10
+    # Seconds of trailing silence that end an answer, or "auto" for Twilio's own end-of-speech detection
+    speech_timeout: str = "auto"
+    # Optional steps accept an empty answer instead of asking again
+    optional: bool = False
+    # Custom handling for answers that branch or need checking
+    handler: Optional[Callable[[PatientRecord, str, VoiceResponse], Awaitable[None]]] = None
+
+
+def speak(verb, text: str, clip: str):
+    """Say a fixed line, or play its recording when PROMPT_AUDIO_BASE_URL is set"""
+    # Twilio caches played audio across calls, so recorded prompts skip per-call TTS
+    if PROMPT_AUDIO_BASE_URL:
+        verb.play(f"{PROMPT_AUDIO_BASE_URL}/{clip}.mp3")
+    else:
+        verb.say(text)
 
 
-@app.post("/voice/retry-name")
-async def retry_name(request: Request):
-    """Retry collecting patient name"""
-    response = VoiceResponse()
-    response.say("I'm sorry, I didn't catch that.")
-    
+def gather_step(
+    response: VoiceResponse,
+    step_id: str,
+    prompt: Optional[str] = None,
+    clip: Optional[str] = None,
+    fallback: Optional[str] = "/voice/retry/{step_id}",
+):
+    """Ask the question for a step, redirecting to fallback if no answer is heard"""
+    step = STEPS[step_id]
     gather = response.gather(
-        input="speech",
-        action="/voice/collect-name",
+        input=step.input,
+        action=f"/voice/collect/{step_id}",
         method="POST",
-        speech_timeout="auto",
-        timeout=10
+        speech_timeout=step.speech_timeout,
+        timeout=step.timeout
     )
-    gather.say("Could you please tell me your full name one more time?")
-    
-    # Final fallback - end call
-    response.say("I'm having trouble hearing you. Please try calling back when you have a better connection. Goodbye.")
-    return PlainTextResponse(str(response), media_type="application/xml")
+    speak(gather, prompt or step.prompt, clip or f"{step_id}_prompt")
+    # Without a fallback, Twilio falls through to whatever verbs the caller adds next
+    if fallback is not None:
+        response.redirect(fallback.format(step_id=step_id), method="POST")
 
 
-@app.post("/voice/collect-dob")
-async def collect_dob(request: Request):
-    """Collect date of birth and continue intake process"""
-    try:
-        form_data = await request.form()
-        dob = form_data.get("SpeechResult", "").strip()
-        
-        logger.info(f"Patient provided DOB: {dob}")
-        
-        # Store the DOB
-        patient_info["date_of_birth"] = dob
-        
-        response = VoiceResponse()
-        
-        if dob:
-            response.say(f"Thank you. I have your date of birth as {dob}.")
-            
-            # Collect insurance
-            gather = response.gather(
-                input="speech",
-                action="/voice/collect-insurance",
-                method="POST",
-                speech_timeout="auto",
-                timeout=10
-            )
-            gather.say("What insurance company do you have?")
-            
-            # Fallback - redirect to retry
-            response.redirect("/voice/retry-insurance", method="POST")
-        else:
-            # Redirect to retry
-            response.redirect("/voice/retry-dob", method="POST")
-        
-        return PlainTextResponse(str(response), media_type="application/xml")
-        
-    except Exception as e:
-        logger.error(f"Error collecting DOB: {e}")
-        response = VoiceResponse()
-        response.say("I'm sorry, there was an error. Please try again later.")
-        return PlainTextResponse(str(response), media_type="application/xml")
+# Yes/no answers to the referral question
+_YES_RE = re.compile(r"\b(?:yes|yeah|yep|yup|have|got|sure|affirmative|correct|right)\b", re.IGNORECASE).search
+_NO_RE = re.compile(r"\b(?:no|nope|nah|not|don't|do not|haven't|none|negative)\b", re.IGNORECASE).search
 
 
-@app.post("/voice/retry-dob")
-async def retry_dob(request: Request):
-    """Retry collecting date of birth"""
-    response = VoiceResponse()
-    response.say("I'm sorry, I didn't hear your date of birth.")
-    
-    gather = response.gather(
-        input="speech",
-        action="/voice/collect-dob",
-        method="POST",
-        speech_timeout="auto",
-        timeout=10
-    )
-    gather.say("Please tell me your date of birth again. Say the month, day, and year.")
-    
-    # Final fallback - end call
-    response.say("I'm having trouble hearing you. Please try calling back when you have a better connection. Goodbye.")
-    return PlainTextResponse(str(response), media_type="application/xml")
+# Answers to the optional email question; word boundaries keep "john.noble at gmail" from reading as "no"
+_DECLINE_RE = re.compile(r"\b(?:no|nope|don'?t|skip)\b", re.IGNORECASE).search
+_EMAIL_HINT_RE = re.compile(r"@|\bat\b", re.IGNORECASE).search
 
 
-@app.post("/voice/collect-insurance")
-async def collect_insurance(request: Request):
-    """Collect insurance payer name"""
-    try:
-        form_data = await request.form()
-        insurance = form_data.get("SpeechResult", "").strip()
-        
-        logger.info(f"Patient provided insurance: {insurance}")
-        
-        # Store the insurance payer
-        patient_info["insurance_payer"] = insurance
-        
-        response = VoiceResponse()
-        
-        if insurance:
-            response.say(f"Thank you. I have your insurance as {insurance}.")
-            
-            # Collect insurance ID
-            gather = response.gather(
-                input="speech dtmf",
-                action="/voice/collect-insurance-id",
-                method="POST",
-                speech_timeout="auto",
-                timeout=10
-            )
-            gather.say("What is your insurance ID number?")
-            
-            # Fallback - redirect to retry
-            response.redirect("/voice/retry-insurance-id", method="POST")
-        else:
-            # Redirect to retry
-            response.redirect("/voice/retry-insurance", method="POST")
-        
-        return PlainTextResponse(str(response), media_type="application/xml")
-        
-    except Exception as e:
-        logger.error(f"Error collecting insurance: {e}")
-        response = VoiceResponse()
-        response.say("I'm sorry, there was an error. Please try again later.")
-        return PlainTextResponse(str(response), media_type="application/xml")
-
-
-@app.post("/voice/retry-insurance")
-async def retry_insurance(request: Request):
-    """Retry collecting insurance"""
-    response = VoiceResponse()
-    response.say("I'm sorry, I didn't catch your insurance company name.")
-    
-    gather = response.gather(
-        input="speech",
-        action="/voice/collect-insurance",
-        method="POST",
-        speech_timeout="auto",
-        timeout=10
-    )
-    gather.say("Please tell me your insurance company name again.")
+async def handle_referral(patient: PatientRecord, answer: str, response: VoiceResponse):
+    """Ask for the referring physician only if the patient has a referral"""
+    # A "no" wins over "have" in "no, I don't have one"
+    patient.has_referral = _YES_RE(answer) is not None and _NO_RE(answer) is None
     
-    # Final fallback - end call
-    response.say("I'm having trouble hearing you. Please try calling back when you have a better connection. Goodbye.")
-    return PlainTextResponse(str(response), media_type="application/xml")
+    if patient.has_referral:
+        speak(response, "Great.", "great")
+        gather_step(response, "physician")
+    else:
+        patient.referral_physician = ""
+        speak(response, "Okay, no problem.", "no_problem")
+        gather_step(response, "complaint")
 
 
-@app.post("/voice/collect-insurance-id")
-async def collect_insurance_id(request: Request):
-    """Collect insurance ID number"""
-    try:
-        form_data = await request.form()
-        insurance_id = form_data.get("SpeechResult") or form_data.get("Digits", "")
-        insurance_id = insurance_id.strip()
-        
-        logger.info(f"Patient provided insurance ID: {insurance_id}")
-        
-        # Store the insurance ID
-        patient_info["insurance_id"] = insurance_id
-        
-        response = VoiceResponse()
-        
-        if insurance_id:
-            response.say(f"Thank you. I have your insurance ID.")
-            
-            # Ask about referral
-            gather = response.gather(
-                input="speech",
-                action="/voice/collect-referral",
-                method="POST",
-                speech_timeout="auto",
-                timeout=10
-            )
-            gather.say("Do you have a referral from another physician?")
-            
-            # Fallback - redirect to retry
-            response.redirect("/voice/retry-referral", method="POST")
-        else:
-            # Redirect to retry
-            response.redirect("/voice/retry-insurance-id", method="POST")
-        
-        return PlainTextResponse(str(response), media_type="application/xml")
-        
-    except Exception as e:
-        logger.error(f"Error collecting insurance ID: {e}")
-        response = VoiceResponse()
-        response.say("I'm sorry, there was an error. Please try again later.")
-        return PlainTextResponse(str(response), media_type="application/xml")
+async def handle_address(patient: PatientRecord, address: str, response: VoiceResponse):
+    """Validate the address and ask again if parts are missing"""
+    validation_result = await validate_address(address)
+    patient.address = address
+    patient.address_valid = validation_result["valid"]
+    
+    if validation_result["valid"]:
+        speak(response, "Thank you. I have your address.", "address_confirmation")
+        gather_step(response, "contact")
+    else:
+        # Address validation failed
+        response.say(f"I'm sorry, but {validation_result['message']}")
+        speak(response, "Let me ask for your address again.", "address_ask_again")
+        gather_step(
+            response,
+            "address",
+            "Please provide your complete mailing address including street number, city, state, and ZIP code.",
+            clip="address_reprompt"
+        )
 
 
-@app.post("/voice/retry-insurance-id")
-async def retry_insurance_id(request: Request):
-    """Retry collecting insurance ID"""
-    response = VoiceResponse()
-    response.say("I'm sorry, I didn't catch your insurance ID number.")
+async def handle_email(patient: PatientRecord, email_response: str, response: VoiceResponse):
+    """Store the optional email, then offer appointments and finish the call"""
+    email_response = email_response.lower()
     
-    gather = response.gather(
-        input="speech dtmf",
-        action="/voice/collect-insurance-id",
-        method="POST",
-        speech_timeout="auto",
-        timeout=10
-    )
-    gather.say("Please tell me your insurance ID number again.")
+    # Check if they declined
+    if _DECLINE_RE(email_response):
+        patient.email = ""
+        closing = ["No problem."]
+    elif _EMAIL_HINT_RE(email_response):
+        # They provided an email (roughly)
+        patient.email = email_response
+        closing = ["Thank you. I have your email."]
+    else:
+        patient.email = email_response
+        closing = ["Got it."]
     
-    # Final fallback - end call
-    response.say("I'm having trouble hearing you. Please try calling back when you have a better connection. Goodbye.")
-    return PlainTextResponse(str(response), media_type="application/xml")
-
-
-@app.post("/voice/collect-referral")
-async def collect_referral(request: Request):
-    """Collect referral information"""
-    try:
-        form_data = await request.form()
-        referral_response = form_data.get("SpeechResult", "").strip().lower()
-        
-        logger.info(f"Patient referral response: {referral_response}")
-        
-        response = VoiceResponse()
-        
-        if referral_response:
-            # Check if they said yes/no
-            has_referral = any(word in referral_response for word in ["yes", "yeah", "yep", "have", "got"])
-            
-            if has_referral:
-                patient_info["has_referral"] = True
-                response.say("Great.")
-                
-                # Ask for physician name
-                gather = response.gather(
-                    input="speech",
-                    action="/voice/collect-physician",
-                    method="POST",
-                    speech_timeout="auto",
-                    timeout=10
-                )
-                gather.say("Which physician referred you?")
-                
-                response.redirect("/voice/retry-physician", method="POST")
-            else:
-                patient_info["has_referral"] = False
-                patient_info["referral_physician"] = ""
-                response.say("Okay, no problem.")
-                
-                # Move to chief complaint
-                gather = response.gather(
-                    input="speech",
-                    action="/voice/collect-complaint",
-                    method="POST",
-                    speech_timeout="auto",
-                    timeout=15
-                )
-                gather.say("What is the main reason for your visit today?")
-                
-                response.redirect("/voice/retry-complaint", method="POST")
-        else:
-            response.redirect("/voice/retry-referral", method="POST")
-        
-        return PlainTextResponse(str(response), media_type="application/xml")
-        
-    except Exception as e:
-        logger.error(f"Error collecting referral: {e}")
-        response = VoiceResponse()
-        response.say("I'm sorry, there was an error. Please try again later.")
-        return PlainTextResponse(str(response), media_type="application/xml")
-
-
-@app.post("/voice/retry-referral")
-async def retry_referral(request: Request):
-    """Retry collecting referral"""
-    response = VoiceResponse()
-    response.say("I'm sorry, I didn't catch that.")
+    # Now show appointments and complete
+    appointments = await generate_appointments()
+    patient.stage = "complete"
     
-    gather = response.gather(
-        input="speech",
-        action="/voice/collect-referral",
-        method="POST",
-        speech_timeout="auto",
-        timeout=10
+    closing.append("Great! Let me show you our available appointments.")
+    closing.append("We have the following times available:")
+    closing.extend(
+        f"Option {i}: {apt.date} at {apt.time} with {apt.doctor}." for i, apt in enumerate(appointments, 1)
     )
-    gather.say("Do you have a referral from another physician? Please say yes or no.")
     
-    # Final fallback - end call
-    response.say("I'm having trouble hearing you. Please try calling back when you have a better connection. Goodbye.")
-    return PlainTextResponse(str(response), media_type="application/xml")
-
-
-@app.post("/voice/collect-physician")
-async def collect_physician(request: Request):
-    """Collect referring physician name"""
-    try:
-        form_data = await request.form()
-        physician = form_data.get("SpeechResult", "").strip()
-        
-        logger.info(f"Patient provided physician: {physician}")
-        
-        # Store the physician
-        patient_info["referral_physician"] = physician
-        
-        response = VoiceResponse()
-        
-        if physician:
-            response.say(f"Thank you. I have the referral from Doctor {physician}.")
-            
-            # Move to chief complaint
-            gather = response.gather(
-                input="speech",
-                action="/voice/collect-complaint",
-                method="POST",
-                speech_timeout="auto",
-                timeout=15
-            )
-            gather.say("What is the main reason for your visit today?")
-            
-            response.redirect("/voice/retry-complaint", method="POST")
-        else:
-            response.redirect("/voice/retry-physician", method="POST")
-        
-        return PlainTextResponse(str(response), media_type="application/xml")
-        
-    except Exception as e:
-        logger.error(f"Error collecting physician: {e}")
-        response = VoiceResponse()
-        response.say("I'm sorry, there was an error. Please try again later.")
-        return PlainTextResponse(str(response), media_type="application/xml")
-
-
-@app.post("/voice/retry-physician")
-async def retry_physician(request: Request):
-    """Retry collecting physician"""
-    response = VoiceResponse()
-    response.say("I'm sorry, I didn't catch the physician's name.")
+    # Select the first appointment as default
+    selected_appointment = appointments[0]
+    patient.appointment = selected_appointment
     
-    gather = response.gather(
-        input="speech",
-        action="/voice/collect-physician",
-        method="POST",
-        speech_timeout="auto",
-        timeout=10
-    )
-    gather.say("Which physician referred you? Please tell me their name.")
+    closing.append(f"I've scheduled you for {selected_appointment.date} at {selected_appointment.time} with {selected_appointment.doctor}.")
+    closing.append("Our scheduling team will contact you shortly to confirm your appointment.")
     
-    # Final fallback - end call
-    response.say("I'm having trouble hearing you. Please try calling back when you have a better connection. Goodbye.")
-    return PlainTextResponse(str(response), media_type="application/xml")
-
-
-@app.post("/voice/collect-complaint")
-async def collect_complaint(request: Request):
-    """Collect chief complaint"""
-    try:
-        form_data = await request.form()
-        complaint = form_data.get("SpeechResult", "").strip()
-        
-        logger.info(f"Patient provided complaint: {complaint}")
-        
-        response = VoiceResponse()
-        
-        if complaint:
-            # Store the complaint
-            patient_info["chief_complaint"] = complaint
-            
-            response.say(f"Thank you. I have your reason for the visit as {complaint}.")
-            
-            # Collect address
-            gather = response.gather(
-                input="speech",
-                action="/voice/collect-address",
-                method="POST",
-                speech_timeout="auto",
-                timeout=15
-            )
-            gather.say("What is your complete mailing address? Please include street, city, state, and ZIP code.")
-            
-            response.redirect("/voice/retry-address", method="POST")
-        else:
-            # Redirect to retry
-            response.redirect("/voice/retry-complaint", method="POST")
-        
-        return PlainTextResponse(str(response), media_type="application/xml")
-        
-    except Exception as e:
-        logger.error(f"Error collecting complaint: {e}")
-        response = VoiceResponse()
-        response.say("I'm sorry, there was an error. Please try again later.")
-        return PlainTextResponse(str(response), media_type="application/xml")
+    # Send the appointment confirmation in the background so the caller isn't left in silence
+    schedule_patient_info_email(patient)
+    closing.append("Your appointment confirmation is being sent.")
+    
+    closing.append("Thank you for calling. We look forward to seeing you. Goodbye.")
+    
+    # One <Say> lets Twilio synthesize the closing without gaps between verbs
+    response.say(" ".join(closing))
+
+
+STEPS: dict[str, IntakeStep] = {
+    "name": IntakeStep(
+        field="name",
+        prompt="May I have your full name, please?",
+        retry_notice="I'm sorry, I didn't catch that.",
+        retry_prompt="Could you please tell me your full name one more time?",
+        confirmation="Thank you, {}.",
+        next_step="dob",
+    ),
+    "dob": IntakeStep(
+        field="date_of_birth",
+        prompt="What is your date of birth? Please say the month, day, and year.",
+        retry_notice="I'm sorry, I didn't hear your date of birth.",
+        retry_prompt="Please tell me your date of birth again. Say the month, day, and year.",
+        confirmation="Thank you. I have your date of birth as {}.",
+        next_step="insurance",
+    ),
+    "insurance": IntakeStep(
+        field="insurance_payer",
+        prompt="What insurance company do you have?",
+        retry_notice="I'm sorry, I didn't catch your insurance company name.",
+        retry_prompt="Please tell me your insurance company name again.",
+        confirmation="Thank you. I have your insurance as {}.",
+        next_step="insurance-id",
+    ),
+    "insurance-id": IntakeStep(
+        field="insurance_id",
+        prompt="What is your insurance ID number?",
+        retry_notice="I'm sorry, I didn't catch your insurance ID number.",
+        retry_prompt="Please tell me your insurance ID number again.",
+        confirmation="Thank you. I have your insurance ID.",
+        next_step="referral",
+        input="speech dtmf",
+    ),
+    "referral": IntakeStep(
+        field="has_referral",
+        prompt="Do you have a referral from another physician?",
+        retry_notice="I'm sorry, I didn't catch that.",
+        retry_prompt="Do you have a referral from another physician? Please say yes or no.",
+        handler=handle_referral,
+    ),
+    "physician": IntakeStep(
+        field="referral_physician",
+        prompt="Which physician referred you?",
+        retry_notice="I'm sorry, I didn't catch the physician's name.",
+        retry_prompt="Which physician referred you? Please tell me their name.",
+        confirmation="Thank you. I have the referral from Doctor {}.",
+        next_step="complaint",
+    ),
+    "complaint": IntakeStep(
+        field="chief_complaint",
+        prompt="What is the main reason for your visit today?",
+        retry_notice="I'm sorry, I didn't catch that.",
+        retry_prompt="Please tell me the main reason for your visit one more time.",
+        confirmation="Thank you. I have your reason for the visit as {}.",
+        next_step="address",
+        timeout=12,
+        speech_timeout="2",
+    ),
+    "address": IntakeStep(
+        field="address",
+        prompt="What is your complete mailing address? Please include street, city, state, and ZIP code.",
+        retry_notice="I'm sorry, I didn't catch your complete address.",
+        retry_prompt="Please tell me your mailing address again, including street, city, state, and ZIP code.",
+        timeout=12,
+        speech_timeout="2",
+        handler=handle_address,
+    ),
+    "contact": IntakeStep(
+        field="phone",
+        prompt="What is the best phone number to reach you?",
+        retry_notice="I'm sorry, I didn't catch your phone number.",
+        retry_prompt="Please tell me your phone number again.",
+        next_step="email",
+        input="speech dtmf",
+        timeout=6,
+        speech_timeout="2",
+    ),
+    "email": IntakeStep(
+        field="email",
+        prompt="Would you like to provide an email address? Say your email or say no.",
+        retry_notice="I'm sorry, I didn't catch that.",
+        retry_prompt="Would you like to provide an email address? Say your email or say no.",
+        timeout=6,
+        speech_timeout="1",
+        optional=True,
+        handler=handle_email,
+    ),
+}
 
 
-@app.post("/voice/retry-complaint")
-async def retry_complaint(request: Request):
-    """Retry collecting chief complaint"""
+def _build_retry_twiml(step_id: str, step: IntakeStep) -> bytes:
+    """Build the TwiML bytes for a step's retry prompt"""
     response = VoiceResponse()
-    response.say("I'm sorry, I didn't catch that.")
+    speak(response, step.retry_notice, f"{step_id}_retry_notice")
     
-    gather = response.gather(
-        input="speech",
-        action="/voice/collect-complaint",
-        method="POST",
-        speech_timeout="auto",
-        timeout=15
-    )
-    gather.say("Please tell me the main reason for your visit one more time.")
+    # Still no answer to an optional question - move on without it
+    fallback = "/voice/collect/{step_id}" if step.optional else None
+    gather_step(response, step_id, step.retry_prompt, f"{step_id}_retry_prompt", fallback=fallback)
     
-    # Final fallback - end call
-    response.say("I'm having trouble hearing you. Please try calling back when you have a better connection. Goodbye.")
-    return PlainTextResponse(str(response), media_type="application/xml")
+    if not step.optional:
+        # Final fallback - Twilio only gets here if the gather timed out again, so say goodbye and end the call
+        speak(response, _GOODBYE_FALLBACK, "goodbye")
+        response.hangup()
+    return str(response).encode()
 
 
-@app.post("/voice/collect-address")
-async def collect_address(request: Request):
-    """Collect and validate patient address"""
-    try:
-        form_data = await request.form()
-        address = form_data.get("SpeechResult", "").strip()
-        
-        logger.info(f"Patient provided address: {address}")
-        
-        response = VoiceResponse()
-        
-        if address:
-            # Validate the address
-            validation_result = await validate_address(address)
-            patient_info["address"] = address
-            patient_info["address_valid"] = validation_result["valid"]
-            
-            if validation_result["valid"]:
-                response.say("Thank you. I have your address.")
-                
-                # Collect phone number
-                gather = response.gather(
-                    input="speech dtmf",
-                    action="/voice/collect-contact",
-                    method="POST",
-                    speech_timeout="auto",
-                    timeout=10
-                )
-                gather.say("What is the best phone number to reach you?")
-                
-                response.redirect("/voice/retry-contact", method="POST")
-            else:
-                # Address validation failed
-                response.say(f"I'm sorry, but {validation_result['message']}")
-                response.say("Let me ask for your address again.")
-                
-                gather = response.gather(
-                    input="speech",
-                    action="/voice/collect-address",
-                    method="POST",
-                    speech_timeout="auto",
-                    timeout=15
-                )
-                gather.say("Please provide your complete mailing address including street number, city, state, and ZIP code.")
-                
-                response.redirect("/voice/retry-address", method="POST")
-        else:
-            response.redirect("/voice/retry-address", method="POST")
-        
-        return PlainTextResponse(str(response), media_type="application/xml")
-        
-    except Exception as e:
-        logger.error(f"Error collecting address: {e}")
-        response = VoiceResponse()
-        response.say("I'm sorry, there was an error. Please try again later.")
-        return PlainTextResponse(str(response), media_type="application/xml")
+# Retry prompts are identical on every call, so their TwiML is serialized once at import
+_RETRY_TWIML = {step_id: _build_retry_twiml(step_id, step) for step_id, step in STEPS.items()}
 
 
-@app.post("/voice/retry-address")
-async def retry_address(request: Request):
-    """Retry collecting address"""
+def _build_error_twiml() -> bytes:
+    """Build the TwiML bytes for the shared error reply"""
     response = VoiceResponse()
-    response.say("I'm sorry, I didn't catch your complete address.")
-    
-    gather = response.gather(
-        input="speech",
-        action="/voice/collect-address",
-        method="POST",
-        speech_timeout="auto",
-        timeout=15
-    )
-    gather.say("Please tell me your mailing address again, including street, city, state, and ZIP code.")
-    
-    # Final fallback - end call
-    response.say("I'm having trouble hearing you. Please try calling back when you have a better connection. Goodbye.")
-    return PlainTextResponse(str(response), media_type="application/xml")
+    speak(response, "I'm sorry, there was an error. Please try again later.", "error")
+    return str(response).encode()
 
 
-@app.post("/voice/collect-contact")
-async def collect_contact(request: Request):
-    """Collect contact phone number"""
-    try:
-        form_data = await request.form()
-        phone = form_data.get("SpeechResult") or form_data.get("Digits", "")
-        phone = phone.strip()
-        caller_phone = form_data.get("From")
-        
-        logger.info(f"Patient provided contact phone: {phone}")
-        
-        response = VoiceResponse()
-        
-        if phone:
-            # Store phone (or use caller ID if not provided)
-            patient_info["phone"] = phone if phone else caller_phone
-            
-            response.say("Thank you.")
-            
-            # Ask for email
-            gather = response.gather(
-                input="speech",
-                action="/voice/collect-email",
-                method="POST",
-                speech_timeout="auto",
-                timeout=10
-            )
-            gather.say("Would you like to provide an email address? Say your email or say no.")
-            
-            response.redirect("/voice/retry-email", method="POST")
-        else:
-            response.redirect("/voice/retry-contact", method="POST")
-        
-        return PlainTextResponse(str(response), media_type="application/xml")
-        
-    except Exception as e:
-        logger.error(f"Error collecting contact: {e}")
-        response = VoiceResponse()
-        response.say("I'm sorry, there was an error. Please try again later.")
-        return PlainTextResponse(str(response), media_type="application/xml")
+# Shared reply for any webhook that fails while building its response
+_ERROR_TWIML = _build_error_twiml()
 
 
-@app.post("/voice/retry-contact")
-async def retry_contact(request: Request):
-    """Retry collecting contact phone"""
+@app.post("/voice/incoming")
+async def handle_voice_webhook(request: Request):
+    """Handle incoming Twilio voice calls"""
+    form_data = await read_form_fields(request, "From", "CallSid")
+    caller_phone = form_data.get("From")
+    call_sid = form_data.get("CallSid")
+    
+    logger.info(" Incoming call from %s, Call SID: %s", caller_phone, call_sid)
+    
+    # Start a fresh record for this call; caller ID stands in until they give a number
+    start_call_record(call_sid, PatientRecord(phone=caller_phone))
+    
+    # Return TwiML response to start patient intake; the short pause lets the
+    # media path settle so the start of the greeting isn't clipped
     response = VoiceResponse()
-    response.say("I'm sorry, I didn't catch your phone number.")
+    response.pause(length=1)
+    speak(response, "Hello! Thank you for calling our patient intake system.", "greeting")
     
-    gather = response.gather(
-        input="speech dtmf",
-        action="/voice/collect-contact",
-        method="POST",
-        speech_timeout="auto",
-        timeout=10
-    )
-    gather.say("Please tell me your phone number again.")
+    # Use gather to collect voice input for name, with a retry fallback
+    gather_step(response, "name")
     
-    # Final fallback - end call
-    response.say("I'm having trouble hearing you. Please try calling back when you have a better connection. Goodbye.")
-    return PlainTextResponse(str(response), media_type="application/xml")
+    return twiml(response)
 
 
-@app.post("/voice/collect-email")
-async def collect_email(request: Request):
-    """Collect email address (optional)"""
-    try:
-        form_data = await request.form()
-        email_response = form_data.get("SpeechResult", "").strip().lower()
-        
-        logger.info(f"Patient email response: {email_response}")
-        
-        response = VoiceResponse()
-        
-        # Check if they declined
-        if any(word in email_response for word in ["no", "nope", "don't", "skip"]):
-            patient_info["email"] = ""
-            response.say("No problem.")
-        elif "@" in email_response or "at" in email_response:
-            # They provided an email (roughly)
-            patient_info["email"] = email_response
-            response.say("Thank you. I have your email.")
-        else:
-            patient_info["email"] = email_response
-            response.say("Got it.")
-        
-        # Now show appointments and complete
-        appointments = await generate_appointments()
-        patient_info["stage"] = "complete"
-        
-        response.say("Great! Let me show you our available appointments.")
-        
-        appointment_text = "We have the following times available: "
-        for i, apt in enumerate(appointments, 1):
-            appointment_text += f"Option {i}: {apt['date']} at {apt['time']} with {apt['doctor']}. "
-        
-        response.say(appointment_text)
-        
-        # Select the first appointment as default
-        selected_appointment = appointments[0]
-        patient_info["appointment"] = selected_appointment
-        
-        response.say(f"I've scheduled you for {selected_appointment['date']} at {selected_appointment['time']} with {selected_appointment['doctor']}.")
-        response.say("Our scheduling team will contact you shortly to confirm your appointment.")
-        
-        # Send appointment confirmation email
-        confirmation_sent = await send_patient_info_email(patient_info)
-        
-        if confirmation_sent:
-            response.say("Your appointment confirmation has been sent.")
-        
-        response.say("Thank you for calling. We look forward to seeing you. Goodbye.")
-        
-        return PlainTextResponse(str(response), media_type="application/xml")
-        
-    except Exception as e:
-        logger.error(f"Error collecting email: {e}")
-        response = VoiceResponse()
-        response.say("I'm sorry, there was an error. Please try again later.")
-        return PlainTextResponse(str(response), media_type="application/xml")
-
-
-@app.post("/voice/retry-email")
-async def retry_email(request: Request):
-    """Retry collecting email"""
+@app.post("/voice/collect/{step_id}")
+async def collect_step(step_id: str, request: Request):
+    """Store the answer to an intake step and ask the next question"""
+    step = STEPS.get(step_id)
+    if step is None:
+        raise HTTPException(status_code=404, detail="Unknown intake step")
+    
+    form_data = await read_form_fields(request, "CallSid", "SpeechResult", "Digits")
+    patient = get_call_record(form_data)
+    answer = (form_data.get("SpeechResult") or form_data.get("Digits", "")).strip()
+    
+    logger.info("Patient provided %s: %s", step_id, answer)
+    
     response = VoiceResponse()
-    response.say("I'm sorry, I didn't catch that.")
     
-    gather = response.gather(
-        input="speech",
-        action="/voice/collect-email",
-        method="POST",
-        speech_timeout="auto",
-        timeout=10
-    )
-    gather.say("Would you like to provide an email address? Say your email or say no.")
+    if not answer and not step.optional:
+        # Redirect to retry
+        response.redirect(f"/voice/retry/{step_id}", method="POST")
+    elif step.handler is not None:
+        await step.handler(patient, answer, response)
+    else:
+        setattr(patient, step.field, answer)
+        if "{}" in step.confirmation:
+            response.say(step.confirmation.format(answer))
+        else:
+            speak(response, step.confirmation, f"{step_id}_confirmation")
+        gather_step(response, step.next_step)
+    
+    if patient.stage == "complete":
+        # The call is finished with this record
+        call_records.pop(form_data.get("CallSid", ""), None)
     
-    # Final fallback - skip email and go to appointments
-    response.redirect("/voice/collect-email", method="POST")
-    return PlainTextResponse(str(response), media_type="application/xml")
+    return twiml(response)
+
+
+@app.post("/voice/retry/{step_id}")
+async def retry_step(step_id: str):
+    """Ask an intake question again after no answer was heard"""
+    content = _RETRY_TWIML.get(step_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Unknown intake step")
+    return twiml(content)
 
 
 @app.post("/webhook/voice")
@@ -1121,14 +1144,22 @@ async def handle_voice_root(request: Request):
 
 
 
+# Twilio call statuses after which no more webhooks arrive for the call
+_FINAL_CALL_STATUSES = frozenset({"completed", "busy", "failed", "no-answer", "canceled"})
+
+
 @app.post("/webhook/status")
 async def handle_status_webhook(request: Request):
     """Handle call status updates"""
-    form_data = await request.form()
+    form_data = await read_form_fields(request, "CallSid", "CallStatus")
     call_sid = form_data.get("CallSid")
     call_status = form_data.get("CallStatus")
     
-    logger.info(f" Call {call_sid} status: {call_status}")
+    logger.info(" Call %s status: %s", call_sid, call_status)
+    
+    # Free the record of a call that hung up before finishing the intake
+    if call_status in _FINAL_CALL_STATUSES:
+        call_records.pop(call_sid, None)
     
     return {"status": "ok"}
 
@@ -1140,9 +1171,24 @@ async def health():
 
 
 if __name__ == "__main__":
-    print(f" Phone-based Patient Intake Agent")
-    print(f" Twilio Number: {TWILIO_PHONE_NUMBER}")
-    print(f" Webhook URL: https://your-domain.com/webhook/voice")
-    print(f" Starting server on port 8000...")
+    logger.info(" Phone-based Patient Intake Agent")
+    logger.info(" Twilio Number: %s", TWILIO_PHONE_NUMBER)
+    logger.info(" Webhook URL: https://your-domain.com/voice/incoming")
+    logger.info(" Starting server on port 8000...")
     
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # "auto" picks uvloop and httptools (installed with uvicorn[standard]) and falls back to
+    # asyncio and h11 where they're unavailable. Call records live in process memory, so every
+    # webhook of a call must reach the same worker: keep WEB_CONCURRENCY at 1 unless requests
+    # are routed by CallSid.
+    uvicorn.run(
+        "phone_agent:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        loop="auto",
+        http="auto",
+        access_log=False,
+        # Twilio posts once per answer, often more than uvicorn's 5s default apart; keeping
+        # the connection open lets each hop reuse it instead of reconnecting
+        timeout_keep_alive=75,
+    )